@@ -5,6 +5,7 @@
 # a model of a Westinghouse-style PWR assembly
 
 import openmc
+import numpy
 import pwr.spacergrid
 import pwr.functions
 
@@ -64,7 +65,7 @@ class Assembly(object):
 		All the above, plus the following created at self.build():
 		bottom:				instance of openmc.ZPlane marking the lowest surface in the Assembly
 		top:				instance of openmc.ZPlane marking the highest surface in the Assembly
-		spacer_elevs:		list of the elevations of the tops/bottoms of all spacer grids
+		spacer_elevs:		numpy array of the elevations of the bottoms/tops of all spacer grids
 		all_elevs:			list of all axial elevations, created when (lattice_elevs + spacer_elevs)
 							have been concatenated, sorted, and checked for duplicates
 		openmc_cells:		list of all instances of openmc.Cell used in the construction of this assembly
@@ -74,13 +75,35 @@ class Assembly(object):
 							{'orig. universe id': gridded instance of openmc.RectLattice}
 		universe:			instance of openmc.Universe; the OpenMC representation of the fuel assembly
 	"""
+	# Parameters which must be set (nonzero/nonempty) before build()
+	_REQUIRED = ('key', 'name', 'pitch', 'npins', 'lattices', 'lattice_elevs', 'mod', 'counter')
 
 	def __init__(self, 	key = "", 		name = "", 			universe_id = None,
-						pitch = 0.0, 	npins = 0,			walls = [],
-                        xplanes = {},   yplanes = {},       zplanes = {},
-						lattices = [], 	lattice_elevs = [],	spacers = [], 	spacer_mids = [],
+						pitch = 0.0, 	npins = 0,			walls = None,
+                        xplanes = None, yplanes = None,     zplanes = None,
+						lattices = None, lattice_elevs = None, spacers = None, spacer_mids = None,
 						lower_nozzle = None, 				upper_nozzle = None, 
-						z_active = [],	mod = None,			counter = None):
+						z_active = None, mod = None,		counter = None):
+		# Each Assembly gets its own lists and surface dictionaries by default.
+		# (Shared default objects would carry planes from one Counter to the next.)
+		if walls is None:
+			walls = []
+		if xplanes is None:
+			xplanes = {}
+		if yplanes is None:
+			yplanes = {}
+		if zplanes is None:
+			zplanes = {}
+		if lattices is None:
+			lattices = []
+		if lattice_elevs is None:
+			lattice_elevs = []
+		if spacers is None:
+			spacers = []
+		if spacer_mids is None:
+			spacer_mids = []
+		if z_active is None:
+			z_active = []
 		self.key = key
 		self.name = name
 		self.universe_id = universe_id
@@ -132,20 +155,15 @@ class Assembly(object):
 		
 		if not self.name:
 			self.name = self.key
-		blank_allowable = ['universe_id', 'spacers', 'spacer_mids', 'upper_nozzle', 'walls', 'z_active',
-		                   'xplanes', 'yplanes', 'zplanes']
-		if min(self.lattice_elevs) == 0:
-			blank_allowable.append('lower_nozzle')
 		
 		# Check that all necessary parameters are present.
-		err_str = "the following attributes need to be set:\n"
-		errs = 0
-		for attr in self.__dict__:
-			if not self.__dict__[attr]:
-				if attr not in blank_allowable:
-					errs += 1
-					err_str += '\t- ' + attr + '\n'
-		if errs:
+		missing = [attr for attr in self._REQUIRED if not getattr(self, attr)]
+		# A lower nozzle is needed unless the lattices start at the bottom.
+		if not self.lower_nozzle and not (self.lattice_elevs and min(self.lattice_elevs) == 0):
+			missing.append('lower_nozzle')
+		if missing:
+			err_str = "the following attributes need to be set:\n"
+			err_str += "".join('\t- ' + attr + '\n' for attr in missing)
 			raise AttributeError(err_str)
 		
 		# Check that the number of entries in the lists is correct
@@ -163,17 +181,19 @@ class Assembly(object):
 			self.z_active = [min(self.lattice_elevs), max(self.lattice_elevs)]
 		
 		# Combine spacer_elevs and lattice_elevs into one list to rule them all
+		# Spacer elevations alternate: [bottom 0, top 0, bottom 1, top 1, ...]
+		heights = numpy.array([spacer.height for spacer in self.spacers], dtype = float)
+		mids = numpy.array(self.spacer_mids, dtype = float)
+		self.spacer_elevs = numpy.empty(2*len(mids))
+		self.spacer_elevs[0::2] = mids - heights / 2.0
+		self.spacer_elevs[1::2] = mids + heights / 2.0
 		if self.spacer_mids:
-			self.spacer_elevs = []
-			for i in range(len(self.spacers)):
-				spacer = self.spacers[i]
-				mid = self.spacer_mids[i]
-				s_bot = mid - spacer.height / 2.0
-				s_top = mid + spacer.height / 2.0
-				self.spacer_elevs += (s_bot, s_top)
-			elevs = self.spacer_elevs + self.lattice_elevs
-			self.all_elevs = list(set(elevs))	# Remove the duplicates
-			self.all_elevs.sort()
+			elevs = numpy.concatenate((self.spacer_elevs, self.lattice_elevs))
+			# Remove the duplicates, including those which only differ by round-off.
+			# This matches the rounding used by get_surface(), which would otherwise
+			# return the same ZPlane for both and create an empty layer between them.
+			first = numpy.unique(numpy.round(elevs, 5), return_index = True)[1]
+			self.all_elevs = elevs[first].tolist()
 		else:
 			self.all_elevs = self.lattice_elevs
 		
@@ -188,7 +208,10 @@ class Assembly(object):
 			min_y = self.__get_surface('yplane', -half, name = self.name + ' - min_y')
 			max_y = self.__get_surface('yplane', +half, name = self.name + ' - max_y')
 			self.walls = [min_x, max_x, min_y, max_y]
-		self.wall_region = openmc.Intersection(+min_x & +min_y & -max_x & -max_y)
+		# Keep the half-spaces themselves so that each axial cell can be
+		# one flat Intersection instead of a nested one.
+		self.__wall_halfspaces = [+min_x, +min_y, -max_x, -max_y]
+		self.wall_region = openmc.Intersection(self.__wall_halfspaces)
 	
 	
 	def build(self):
@@ -206,43 +229,50 @@ class Assembly(object):
 		if self.lower_nozzle:
 			lnoz = openmc.Cell(self.counter.add_cell(), "lower nozzle")
 			nozzle_top = self.__get_surface('zplane', self.lower_nozzle.height)
-			lnoz.region = (self.wall_region & +last_s & -nozzle_top)
+			lnoz.region = openmc.Intersection(self.__wall_halfspaces + [+last_s, -nozzle_top])
 			lnoz.fill = self.lower_nozzle.material
 			self.openmc_cells.append(lnoz)
 			last_s = nozzle_top
 		
+		# Local aliases for the layer loop
+		add_cell = self.counter.add_cell
+		get_surface = self.__get_surface
+		add_openmc_cell = self.openmc_cells.append
+		wall_halfspaces = self.__wall_halfspaces
+		lattices = self.lattices
+		spacers = self.spacers
 		
-		for z in self.all_elevs[1:]:
-			s = self.__get_surface('zplane', z)
-			# See what lattice we are in
-			for i in range(len(self.lattices)):
-				if self.lattice_elevs[i] >= z > self.lattice_elevs[i-1]:
-					break
-			lat = self.lattices[i-1]
+		# See what lattice each layer is in: lattice_elevs[i-1] < z <= lattice_elevs[i]
+		# and where it falls among the spacer elevations. The elevations are compared
+		# as rounded in __prebuild(): all_elevs keeps only one of the values which
+		# differ by round-off, so the other must still be found equal to it.
+		zs = self.all_elevs[1:]
+		rounded_zs = numpy.round(zs, 5)
+		lattice_indices = numpy.searchsorted(numpy.round(self.lattice_elevs, 5), rounded_zs).tolist()
+		spacer_indices = numpy.searchsorted(numpy.round(self.spacer_elevs, 5), rounded_zs).tolist()
+		
+		for z, i, g in zip(zs, lattice_indices, spacer_indices):
+			s = get_surface('zplane', z)
+			lat = lattices[i-1]
 			# Check if there is a spacer grid
-			if self.spacer_mids:
-				for g in range(len(self.spacer_elevs)):
-					if self.spacer_elevs[g] >= z > self.spacer_elevs[g-1]:
-						break
-				# Even numbers are bottoms, odds are top
-				grid = None
-				if g % 2 and z > min(self.spacer_elevs):
-					# Then the last one was a bottom: a grid is present
-					grid = self.spacers[int(g/2)]
-				# OK--now we know what the current lattice is, and whether there's a grid here.
-				if grid:
-					if grid.key not in lat.griddict:
-						# We need to add the spacer grid to this one, and then add it to the index
-						lat.griddict[grid.key] = pwr.add_grid_to(lat, grid, self.counter,
-						                                         self.xplanes, self.yplanes)
-					lat = lat.griddict[grid.key]
-				
+			# Even numbers are bottoms, odds are top
+			if g % 2:
+				# Then the last one was a bottom: a grid is present
+				grid = spacers[g // 2]
+				# OK--now we know what the current lattice is, and that there's a grid here.
+				gridded = lat.griddict.get(grid.key)
+				if gridded is None:
+					# We need to add the spacer grid to this one, and then add it to the index
+					gridded = pwr.add_grid_to(lat, grid, self.counter, self.xplanes, self.yplanes)
+					lat.griddict[grid.key] = gridded
+				lat = gridded
+			
 			# Now, we have the current lattice, for the correct level, with or with a spacer
 			# grid as appropriate. Time to make the layer.
-			layer = openmc.Cell(self.counter.add_cell(), name = lat.name)
-			layer.region = (self.wall_region & +last_s & -s)
+			layer = openmc.Cell(add_cell(), name = lat.name)
+			layer.region = openmc.Intersection(wall_halfspaces + [+last_s, -s])
 			layer.fill = lat
-			self.openmc_cells.append(layer)
+			add_openmc_cell(layer)
 			
 			# And then prepare for the next loop around
 			last_s = s
@@ -252,7 +282,7 @@ class Assembly(object):
 		if self.upper_nozzle:
 			unoz = openmc.Cell(self.counter.add_cell(), "upper nozzle")
 			nozzle_top = self.__get_surface('z', last_s.z0 + self.upper_nozzle.height)
-			unoz.region = (self.wall_region & +last_s & -nozzle_top)
+			unoz.region = openmc.Intersection(self.__wall_halfspaces + [+last_s, -nozzle_top])
 			unoz.fill = self.upper_nozzle.material
 			self.openmc_cells.append(unoz)
 			last_s = nozzle_top
@@ -261,7 +291,8 @@ class Assembly(object):
 		
 		# Finally, surround the whole assembly with moderator
 		mod_cell = openmc.Cell(self.counter.add_cell(), name = self.name + " mod")
-		mod_cell.region = (~self.wall_region | +self.top | -self.bottom)
+		[min_x, max_x, min_y, max_y] = self.walls
+		mod_cell.region = openmc.Union([-min_x, -min_y, +max_x, +max_y, +self.top, -self.bottom])
 		mod_cell.fill = self.mod
 		self.openmc_cells.append(mod_cell)
 		
@@ -308,6 +339,6 @@ if __name__ == '__main__':
 	outer = openmc.Cell(c.add_cell(), fill = mod, region = +cyl2)
 	uni = openmc.Universe(c.add_universe(), cells = (ring0, ring1, ring2, outer), name = "test pincell")
 	print(uni)
-	gridded = pwr.spacergrid.add_spacer_to(uni, 1.0, 0.10, iron, c, [])
+	gridded = pwr.spacergrid.add_spacer_to(uni, 1.0, 0.10, iron, c)
 	print(gridded)
 
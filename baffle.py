@@ -3,6 +3,7 @@
 # Function and class for generating a PWR baffle
 
 import openmc
+import numpy
 from pwr.functions import get_surface
 
 class Baffle(object):
@@ -12,6 +13,8 @@ class Baffle(object):
 		gap:	    thickness of gap (cm) between the outside assembly
 					(including the assembly gap) and the baffle itself
 		"""
+	__slots__ = ("material", "thick", "gap")
+	
 	def __init__(self, material, thick, gap):
 		self.material = material
 		self.thick = thick
@@ -20,6 +23,159 @@ class Baffle(object):
 		return "Baffle (" + self.thick + " cm thick)"
 
 
+# The baffle is traced as rectangles of (x_left, x_right, y_bot, y_top),
+# written to consecutive rows of an array. Each side of the baffle is
+# described once, in terms of the sign of its direction from the center of
+# the assembly: sx = -1 (west) or +1 (east), and sy = -1 (south) or +1 (north).
+
+def _add_rect(rects, k, x0, x1, y0, y1):
+	"""Write the rectangle between two x and two y values to row k of 'rects'.
+	Returns the next row."""
+	rects[k, 0] = min(x0, x1)
+	rects[k, 1] = max(x0, x1)
+	rects[k, 2] = min(y0, y1)
+	rects[k, 3] = max(y0, y1)
+	return k + 1
+
+
+def _add_side_rect_x(rects, k, x, y, sx, north, southern, d1, d2, d3):
+	"""West or east side of the baffle around an interior assembly at (x, y).
+	'southern' is whether the assembly to the south and that one's west/east
+	neighbor both exist."""
+	if north:
+		y_top = y + d3
+	else:
+		y_top = y + d2
+	if southern:
+		y_bot = y - d3
+	else:
+		y_bot = y - d2
+	return _add_rect(rects, k, x + sx*d1, x + sx*d2, y_bot, y_top)
+
+
+def _add_side_rect_y(rects, k, x, y, sy, western, east, d1, d2, d3):
+	"""North or south side of the baffle around an interior assembly at (x, y).
+	'western' is whether the assembly to the west and that one's north/south
+	neighbor both exist."""
+	if western:
+		x_left = x - d3
+	else:
+		x_left = x - d2
+	if east:
+		x_right = x + d3
+	else:
+		x_right = x + d2
+	return _add_rect(rects, k, x_left, x_right, y + sy*d1, y + sy*d2)
+
+
+def _add_edge_rects_x(rects, k, x, y, sx, north, south, d1, d2, d3):
+	"""Baffle along the west or east edge of the core for the assembly at (x, y)"""
+	k = _add_rect(rects, k, x + sx*d1, x + sx*d2, y - d2, y + d2)
+	if not north:
+		k = _add_rect(rects, k, x - sx*d3, x + sx*d2, y + d1, y + d2)
+	if not south:
+		k = _add_rect(rects, k, x - sx*d3, x + sx*d2, y - d2, y - d1)
+	return k
+
+
+def _add_edge_rects_y(rects, k, x, y, sy, west, east, d1, d2, d3):
+	"""Baffle along the north or south edge of the core for the assembly at (x, y)"""
+	k = _add_rect(rects, k, x - d2, x + d2, y + sy*d1, y + sy*d2)
+	if not west:
+		k = _add_rect(rects, k, x - d2, x - d1, y - sy*d3, y + sy*d2)
+	if not east:
+		k = _add_rect(rects, k, x + d1, x + d2, y - sy*d3, y + sy*d2)
+	return k
+
+
+def _trace_baffle(occupied, xs, ys, edge, d1, d2, d3, jmin, jmax, imin, imax):
+	"""Trace the boundary of the baffle around the occupied positions of the core.
+	
+	Inputs:
+		occupied:       square array of booleans; whether each position has an assembly
+		xs, ys:         arrays of the x (column) and y (row) centers of the positions
+		edge:           float; distance from the center of the core to the center
+		                of the outermost assemblies
+		d1, d2, d3:     floats; distances from the center of an assembly to the
+		                inside of the baffle, the outside of the baffle, and the
+		                inside of the next baffle
+		jmin, jmax,
+		imin, imax:     ints; bounding box of the occupied interior positions
+	
+	Output:
+		rects:          array of shape (K, 4) of (x_left, x_right, y_bot, y_top)
+	"""
+	core_size = occupied.shape[0]
+	n = core_size - 1
+	# At most 4 sides per interior position, 3 pieces per edge position, and 2 per corner
+	rects = numpy.empty((4*core_size*core_size + 12*core_size + 8, 4))
+	k = 0
+	
+	# For each row (moving vertically):
+	for j in range(1, n):
+		y = ys[j]
+		if jmin <= j <= jmax:
+			# For each occupied column (moving horizontally):
+			for i in range(imin, imax + 1):
+				if not occupied[j, i]:
+					continue
+				x = xs[i]
+				north = occupied[j - 1, i]
+				south = occupied[j + 1, i]
+				east = occupied[j, i + 1]
+				west = occupied[j, i - 1]
+				
+				# Left side
+				if not west:
+					k = _add_side_rect_x(rects, k, x, y, -1.0, north,
+					                     south and occupied[j + 1, i - 1], d1, d2, d3)
+				# Right side
+				if not east:
+					k = _add_side_rect_x(rects, k, x, y, +1.0, north,
+					                     south and occupied[j + 1, i + 1], d1, d2, d3)
+				# Top side
+				if not north:
+					k = _add_side_rect_y(rects, k, x, y, +1.0,
+					                     west and occupied[j - 1, i - 1], east, d1, d2, d3)
+				# Bottom side
+				if not south:
+					k = _add_side_rect_y(rects, k, x, y, -1.0,
+					                     west and occupied[j + 1, i - 1], east, d1, d2, d3)
+		
+		# Edge cases
+		x = xs[j]
+		# West edge
+		if occupied[j, 0]:
+			k = _add_edge_rects_x(rects, k, -edge, y, -1.0,
+			                      occupied[j - 1, 0], occupied[j + 1, 0], d1, d2, d3)
+		# East edge
+		if occupied[j, n]:
+			k = _add_edge_rects_x(rects, k, +edge, y, +1.0,
+			                      occupied[j - 1, n], occupied[j + 1, n], d1, d2, d3)
+		# North edge
+		if occupied[0, j]:
+			k = _add_edge_rects_y(rects, k, x, +edge, +1.0,
+			                      occupied[0, j - 1], occupied[0, j + 1], d1, d2, d3)
+		# South edge
+		if occupied[n, j]:
+			k = _add_edge_rects_y(rects, k, x, -edge, -1.0,
+			                      occupied[n, j - 1], occupied[n, j + 1], d1, d2, d3)
+	# Done iterating.
+	
+	# Corner cases (UNTESTED): top left, top right, bottom right, bottom left
+	for jj, ii, sx, sy in ((0, 0, -1.0, +1.0), (0, n, +1.0, +1.0),
+	                       (n, n, +1.0, -1.0), (n, 0, -1.0, -1.0)):
+		if occupied[jj, ii]:
+			x = sx * edge
+			y = sy * edge
+			# West or East
+			k = _add_rect(rects, k, x + sx*d1, x + sx*d2, y - d2, y + d2)
+			# North or South
+			k = _add_rect(rects, k, x - d2, x + d2, y + sy*d1, y + sy*d2)
+	
+	return rects[:k]
+
+
 def get_openmc_baffle(baf, cmap, apitch, xplanes, yplanes, count):
 	"""Create the cells and surfaces for the core baffle.
 	
@@ -57,361 +213,42 @@ def get_openmc_baffle(baf, cmap, apitch, xplanes, yplanes, count):
 	d2 = d1 + baf.thick  # dist to outside of baffle
 	d3 = d0 - baf.gap  # dist to inside of next baffle
 	width = core_size * apitch / 2.0  # dist from center of core to center of asmbly
+	edge = width - 0.5 * apitch  # dist from center of core to center of outermost asmbly
 	
-	# Unite all individual regions with the Master Region
-	master_region = openmc.Union([])
-	
-	# For each row (moving vertically):
-	for j in range(1, n):
-		# For each column (moving horizontally):
-		for i in range(1, n):
-			if cmap[j][i]:
-				# Positions of surfaces
-				x = (i + 0.5) * apitch - width
-				y = width - (j + 0.5) * apitch
-				
-				north = cmap[j - 1][i]
-				south = cmap[j + 1][i]
-				east = cmap[j][i + 1]
-				west = cmap[j][i - 1]
-				southeast = cmap[j + 1][i + 1]
-				southwest = cmap[j + 1][i - 1]
-				northeast = cmap[j - 1][i + 1]
-				northwest = cmap[j - 1][i - 1]
-				
-				# Left side
-				if not west:
-					x_left = x - d2
-					x_right = x - d1
-					if north:
-						y_top = y + d3
-					else:
-						y_top = y + d2
-					if south:
-						if southwest:
-							y_bot = y - d3
-						else:
-							y_bot = y - d2
-					else:
-						y_bot = y - d2
-					left = get_surface(count, xplanes, 'x', x_left)
-					right = get_surface(count, xplanes, 'x', x_right)
-					bot = get_surface(count, yplanes, 'y', y_bot)
-					top = get_surface(count, yplanes, 'y', y_top)
-					west_region = (+left & -right & +bot & -top)
-					master_region._nodes.append(west_region)
-				
-				# Right side
-				if not east:
-					x_left = x + d1
-					x_right = x + d2
-					if north:
-						y_top = y + d3
-					else:
-						y_top = y + d2
-					if south:
-						if southeast:
-							y_bot = y - d3
-						else:
-							y_bot = y - d2
-					else:
-						y_bot = y - d2
-					left = get_surface(count, xplanes, 'x', x_left)
-					right = get_surface(count, xplanes, 'x', x_right)
-					bot = get_surface(count, yplanes, 'y', y_bot)
-					top = get_surface(count, yplanes, 'y', y_top)
-					east_region = (+left & -right & +bot & -top)
-					master_region._nodes.append(east_region)
-				
-				# Top side
-				if not north:
-					y_bot = y + d1
-					y_top = y + d2
-					if west:
-						if northwest:
-							x_left = x - d3
-						else:
-							x_left = x - d2
-					else:
-						x_left = x - d2
-					if east:
-						x_right = x + d3
-					else:
-						x_right = x + d2
-					left = get_surface(count, xplanes, 'x', x_left)
-					right = get_surface(count, xplanes, 'x', x_right)
-					bot = get_surface(count, yplanes, 'y', y_bot)
-					top = get_surface(count, yplanes, 'y', y_top)
-					north_region = (+left & -right & +bot & -top)
-					master_region._nodes.append(north_region)
-				
-				# Bottom side
-				if not south:
-					y_bot = y - d2
-					y_top = y - d1
-					if west:
-						if southwest:
-							x_left = x - d3
-						else:
-							x_left = x - d2
-					else:
-						x_left = x - d2
-					if east:
-						x_right = x + d3
-					else:
-						x_right = x + d2
-					left = get_surface(count, xplanes, 'x', x_left)
-					right = get_surface(count, xplanes, 'x', x_right)
-					bot = get_surface(count, yplanes, 'y', y_bot)
-					top = get_surface(count, yplanes, 'y', y_top)
-					south_region = (+left & -right & +bot & -top)
-					master_region._nodes.append(south_region)
-		
-		# Edge cases
-		x = (j + 0.5) * apitch - width
-		y = width - (j + 0.5) * apitch
-		
-		# West edge
-		if cmap[j][0]:
-			north = cmap[j - 1][0]
-			south = cmap[j + 1][0]
-			xx = -(width - 0.5 * apitch)
-			x_left = xx - d2
-			x_right = xx - d1
-			y_bot = y - d2
-			y_top = y + d2
-			
-			left = get_surface(count, xplanes, 'x', x_left)
-			right = get_surface(count, xplanes, 'x', x_right)
-			bot = get_surface(count, yplanes, 'y', y_bot)
-			top = get_surface(count, yplanes, 'y', y_top)
-
-			west_region = (+left & -right & +bot & -top)
-			master_region._nodes.append(west_region)
-			
-			if not north:
-				y_bot = y + d1
-				x_right = xx + d3
-				right = get_surface(count, xplanes, 'x', x_right)
-				bot = get_surface(count, yplanes, 'y', y_bot)
-				north_region = (+left & -right & +bot & -top)
-			master_region._nodes.append(north_region)
-			
-			if not south:
-				y_bot = y - d2
-				y_top = y - d1
-				x_right = xx + d3
-				right = get_surface(count, xplanes, 'x', x_right)
-				bot = get_surface(count, yplanes, 'y', y_bot)
-				top = get_surface(count, yplanes, 'y', y_top)
-				south_region = (+left & -right & +bot & -top)
-				master_region._nodes.append(south_region)
-		
-		# East edge
-		if cmap[j][n]:
-			north = cmap[j - 1][n]
-			south = cmap[j + 1][n]
-			xx = +(width - 0.5 * apitch)
-			x_left = xx + d1
-			x_right = xx + d2
-			y_bot = y - d2
-			y_top = y + d2
-			left = get_surface(count, xplanes, 'x', x_left)
-			right = get_surface(count, xplanes, 'x', x_right)
-			bot = get_surface(count, yplanes, 'y', y_bot)
-			top = get_surface(count, yplanes, 'y', y_top)
-			east_region = (+left & -right & +bot & -top)
-			master_region._nodes.append(east_region)
-			
-			if not north:
-				y_bot = y + d1
-				x_left = xx - d3
-				left = get_surface(count, xplanes, 'x', x_left)
-				bot = get_surface(count, yplanes, 'y', y_bot)
-				north_region = (+left & -right & +bot & -top)
-			master_region._nodes.append(north_region)
-			
-			if not south:
-				y_bot = y - d2
-				y_top = y - d1
-				x_left = xx - d3
-				left = get_surface(count, xplanes, 'x', x_left)
-				bot = get_surface(count, yplanes, 'y', y_bot)
-				top = get_surface(count, yplanes, 'y', y_top)
-				south_region = (+left & -right & +bot & -top)
-				master_region._nodes.append(south_region)
-		
-		# North edge
-		if cmap[0][j]:
-			east = cmap[0][j + 1]
-			west = cmap[0][j - 1]
-			yy = +(width - 0.5 * apitch)
-			x_left = x - d2
-			x_right = x + d2
-			y_bot = yy + d1
-			y_top = yy + d2
-			left = get_surface(count, xplanes, 'x', x_left)
-			right = get_surface(count, xplanes, 'x', x_right)
-			bot = get_surface(count, yplanes, 'y', y_bot)
-			top = get_surface(count, yplanes, 'y', y_top)
-			north_region = (+left & -right & +bot & -top)
-			master_region._nodes.append(north_region)
-			
-			if not west:
-				x_right = x - d1
-				y_bot = yy - d3
-				right = get_surface(count, xplanes, 'x', x_right)
-				bot = get_surface(count, yplanes, 'y', y_bot)
-				west_region = (+left & -right & +bot & -top)
-				master_region._nodes.append(west_region)
-			
-			if not east:
-				x_left = x + d1
-				x_right = x + d2
-				y_bot = yy - d3
-				left = get_surface(count, xplanes, 'x', x_left)
-				right = get_surface(count, xplanes, 'x', x_right)
-				bot = get_surface(count, yplanes, 'y', y_bot)
-				top = get_surface(count, yplanes, 'y', y_top)
-				east_region = (+left & -right & +bot & -top)
-				master_region._nodes.append(east_region)
-		
-		# South edge
-		if cmap[n][j]:
-			east = cmap[n][j + 1]
-			west = cmap[n][j - 1]
-			yy = -(width - 0.5 * apitch)
-			x_left = x - d2
-			x_right = x + d2
-			y_bot = yy - d2
-			y_top = yy - d1
-			left = get_surface(count, xplanes, 'x', x_left)
-			right = get_surface(count, xplanes, 'x', x_right)
-			bot = get_surface(count, yplanes, 'y', y_bot)
-			top = get_surface(count, yplanes, 'y', y_top)
-			south_region = (+left & -right & +bot & -top)
-			master_region._nodes.append(south_region)
-			
-			if not west:
-				x_right = x - d1
-				y_top = yy + d3
-				right = get_surface(count, xplanes, 'x', x_right)
-				top = get_surface(count, yplanes, 'y', y_top)
-				west_region = (+left & -right & +bot & -top)
-				master_region._nodes.append(west_region)
-			
-			if not east:
-				x_left = x + d1
-				x_right = x + d2
-				y_top = yy + d3
-				left = get_surface(count, xplanes, 'x', x_left)
-				right = get_surface(count, xplanes, 'x', x_right)
-				top = get_surface(count, yplanes, 'y', y_top)
-				east_region = (+left & -right & +bot & -top)
-				master_region._nodes.append(east_region)
-	# Done iterating.
-	
-	
-	# Corner cases (UNTESTED)
-	# Top left
-	if cmap[0][0]:
-		x = -(width - 0.5 * apitch)
-		y = -x
-		x_left = x - d2
-		y_top = y + d2
-		
-		# West
-		x_right = x - d1
-		y_bot = y - d2
-		left = get_surface(count, xplanes, 'x', x_left)
-		right = get_surface(count, xplanes, 'x', x_right)
-		bot = get_surface(count, yplanes, 'y', y_bot)
-		top = get_surface(count, yplanes, 'y', y_top)
-		west_region = (+left & -right & +bot & -top)
-		master_region._nodes.append(west_region)
-		
-		# North
-		x_right = x + d2
-		y_bot = y + d1
-		right = get_surface(count, xplanes, 'x', x_right)
-		bot = get_surface(count, yplanes, 'y', y_bot)
-		north_region = (+left & -right & +bot & -top)
-		master_region._nodes.append(north_region)
+	# Positions of the centers of each column (x) and row (y)
+	centers = (numpy.arange(core_size) + 0.5) * apitch
+	xs = centers - width
+	ys = width - centers
 	
-	# Top right
-	if cmap[0][n]:
-		x = +(width - 0.5 * apitch)
-		y = +x
-		x_right = x + d2
-		y_top = y + d2
-		
-		# East
-		x_left = x + d1
-		y_bot = y - d2
-		left = get_surface(count, xplanes, 'x', x_left)
-		right = get_surface(count, xplanes, 'x', x_right)
-		bot = get_surface(count, yplanes, 'y', y_bot)
-		top = get_surface(count, yplanes, 'y', y_top)
-		east_region = (+left & -right & +bot & -top)
-		master_region._nodes.append(east_region)
-		
-		# North
-		x_left = x - d2
-		y_bot = y + d1
-		left = get_surface(count, xplanes, 'x', x_left)
-		bot = get_surface(count, yplanes, 'y', y_bot)
-		north_region = (+left & -right & +bot & -top)
-		master_region._nodes.append(north_region)
+	# Boolean map of the core, and the bounding box of its occupied interior
+	# positions. Only the bounding box is searched, so empty rows and columns
+	# are skipped. (An empty box is passed as jmin > jmax.)
+	occupied = numpy.asarray(cmap, dtype = bool)
+	interior = occupied[1:n, 1:n]
+	row_any = interior.any(axis = 1)
+	col_any = interior.any(axis = 0)
+	jmin, jmax, imin, imax = 1, 0, 1, 0
+	if row_any.any():
+		jmin = 1 + int(row_any.argmax())
+		jmax = n - 1 - int(row_any[::-1].argmax())
+		imin = 1 + int(col_any.argmax())
+		imax = n - 1 - int(col_any[::-1].argmax())
 	
-	# Bottom right
-	if cmap[n][n]:
-		x = +(width - 0.5 * apitch)
-		y = -x
-		x_right = x + d2
-		y_bot = y - d2
-		
-		# East
-		x_left = x + d1
-		y_top = y + d2
-		left = get_surface(count, xplanes, 'x', x_left)
-		right = get_surface(count, xplanes, 'x', x_right)
-		bot = get_surface(count, yplanes, 'y', y_bot)
-		top = get_surface(count, yplanes, 'y', y_top)
-		east_region = (+left & -right & +bot & -top)
-		master_region._nodes.append(east_region)
-		
-		# South
-		x_left = x - d2
-		y_top = y - d1
-		left = get_surface(count, xplanes, 'x', x_left)
-		top = get_surface(count, yplanes, 'y', y_top)
-		south_region = (+left & -right & +bot & -top)
-		master_region._nodes.append(south_region)
+	# The map is traced in terms of the coordinates (x_left, x_right, y_bot, y_top)
+	# of each rectangular piece of the baffle. The planes are created afterwards.
+	rects = _trace_baffle(occupied, xs, ys, edge, d1, d2, d3, jmin, jmax, imin, imax)
 	
-	# Bottom left
-	if cmap[n][0]:
-		x = -(width - 0.5 * apitch)
-		y = +x
-		x_left = x - d2
-		y_bot = y - d2
-		
-		# West
-		x_right = x - d1
-		y_top = y + d2
-		left = get_surface(count, xplanes, 'x', x_left)
-		right = get_surface(count, xplanes, 'x', x_right)
-		bot = get_surface(count, yplanes, 'y', y_bot)
-		top = get_surface(count, yplanes, 'y', y_top)
-		west_region = (+left & -right & +bot & -top)
-		master_region._nodes.append(west_region)
-		
-		# South
-		x_right = x + d2
-		y_top = y - d1
-		right = get_surface(count, xplanes, 'x', x_right)
-		top = get_surface(count, yplanes, 'y', y_top)
-		south_region = (+left & -right & +bot & -top)
-		master_region._nodes.append(south_region)
+	# Create each distinct plane once (to 5 decimal places, like get_surface()),
+	# and look up the planes bounding each rectangle by index.
+	coords = numpy.round(rects, 5)
+	x0s, xindices = numpy.unique(coords[:, 0:2], return_inverse = True)
+	y0s, yindices = numpy.unique(coords[:, 2:4], return_inverse = True)
+	xps = [get_surface(count, xplanes, 'x', x0) for x0 in x0s.tolist()]
+	yps = [get_surface(count, yplanes, 'y', y0) for y0 in y0s.tolist()]
+	regions = [openmc.Intersection([+xps[l], -xps[r], +yps[b], -yps[t]])
+	           for (l, r), (b, t) in zip(xindices.reshape(-1, 2).tolist(), yindices.reshape(-1, 2).tolist())]
+	# Unite all individual regions with the Master Region
+	master_region = openmc.Union(regions)
 	
 	# Note: This seems to require the 'count.add_cell()' argument to avoid
 	# overwriting existing cell numbers, sometimes.
@@ -45,6 +45,11 @@ class Counter(object):
 	def add_surface(self):
 		self.surface += 1
 		return self.surface
+	def add_surfaces(self, n):
+		# Reserve the next n surface ids at once
+		first = self.surface + 1
+		self.surface += n
+		return range(first, self.surface + 1)
 	def add_cell(self):
 		self.cell += 1
 		return self.cell
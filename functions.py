@@ -4,6 +4,69 @@
 
 import openmc
 import copy
+import functools
+
+# Private, so that 'from pwr.functions import *' does not export them from pwr.
+# Numba is optional, and is only imported when something first asks for it,
+# so that 'import pwr' does not pay for loading it.
+_HAVE_NUMBA = None
+
+
+def _have_numba():
+	"""Whether Numba can be imported. Only tried on the first call."""
+	global _HAVE_NUMBA
+	if _HAVE_NUMBA is None:
+		try:
+			import numba
+			_HAVE_NUMBA = True
+		except ImportError:
+			_HAVE_NUMBA = False
+	return _HAVE_NUMBA
+
+
+def _njit(*args, **kwargs):
+	"""Stand-in for numba.njit, used as @_njit or @_njit(...)
+	
+	The function is compiled on its first call, not when it is decorated.
+	Without Numba, it simply runs as regular Python."""
+	def decorate(func):
+		compiled = []
+		
+		@functools.wraps(func)
+		def wrapper(*fargs):
+			if not compiled:
+				if _have_numba():
+					from numba import njit
+					compiled.append(njit(**kwargs)(func))
+				else:
+					compiled.append(func)
+			return compiled[0](*fargs)
+		return wrapper
+	
+	if len(args) == 1 and callable(args[0]) and not kwargs:
+		return decorate(args[0])
+	return decorate
+
+
+# Base classes that duplicate() understands, and the Counter method
+# which issues the next id for each of them.
+_COUNTED_CLASSES = ((openmc.Surface, "add_surface"),
+                    (openmc.Cell, "add_cell"),
+                    (openmc.Material, "add_material"),
+                    (openmc.Universe, "add_universe"),
+                    (openmc.Tally, "add_tally"))
+# Cache of {type: Counter method name}, filled in as new types are seen
+_COUNTER_METHODS = {}
+
+
+def _get_counter_method(cls):
+	"""Find the name of the Counter method for an OpenMC class (or subclass),
+	and remember it for the next lookup. Returns None if the class is unknown."""
+	for base, method in _COUNTED_CLASSES:
+		if issubclass(cls, base):
+			_COUNTER_METHODS[cls] = method
+			return method
+	return None
 
 
 def duplicate(orig, counter):
@@ -16,25 +79,37 @@ def duplicate(orig, counter):
 	Output:
 		dupl: 		same as 'orig', but with a different instance.id
 	"""
-	dup = copy.copy(orig)
-	if isinstance(orig, openmc.Surface):
-		dup.id = counter.add_surface()
-	elif isinstance(orig, openmc.Cell):
+	cls = type(orig)
+	if cls is openmc.Cell:
+		# A plain Cell is copied by its instance dictionary, which is cheaper than
+		# the generic copy protocol but keeps the same state as copy.copy():
+		# the fill, region, volume, etc. are all shared with 'orig'.
+		dup = cls.__new__(cls)
+		dup.__dict__.update(orig.__dict__)
 		dup.id = counter.add_cell()
-	elif isinstance(orig, openmc.Material):
-		dup.id = counter.add_material()
-	elif isinstance(orig, openmc.Universe):
-		dup.id = counter.add_universe()
-	elif isinstance(orig, openmc.Tally):
-		dup.id = counter.add_tally()
-	else:
-		name = orig.__class__.__name__
+		return dup
+	method = _COUNTER_METHODS.get(cls) or _get_counter_method(cls)
+	if method is None:
+		name = cls.__name__
 		raise TypeError(str(orig) + " is an instance of " + name +
 		                "; expected Surface, Cell, Material, or Universe")
+	dup = copy.copy(orig)
+	dup.id = getattr(counter, method)()
 	return dup
 
 
 
+# Single-coefficient surface types that get_surface() can generate:
+# {alias: (openmc.Surface subclass, name of its coefficient)}
+_SURFACE_TYPES = {}
+for _aliases, _surface_type in ((("x", "xp", "xplane"), (openmc.XPlane, "x0")),
+                                (("y", "yp", "yplane"), (openmc.YPlane, "y0")),
+                                (("z", "zp", "zplane"), (openmc.ZPlane, "z0")),
+                                (("r", "cyl", "cylinder", "zcylinder"), (openmc.ZCylinder, "R"))):
+	for _alias in _aliases:
+		_SURFACE_TYPES[_alias] = _surface_type
+
+
 def get_surface(counter, surfdict, dim, coeff, name = "", rd = 5):
 	"""Given a single-coefficient Surface class (such as ZPlane, or Cylinder centered at 0,0),
 	look it up in the provided dictionary 'surfdict' if possible. If not, generate it anew,
@@ -59,23 +134,18 @@ def get_surface(counter, surfdict, dim, coeff, name = "", rd = 5):
 	"""
 	coeff = round(coeff, rd)
 	key = str(coeff)
-	dim = dim.lower()
-	if key in surfdict:
-		return surfdict[key]
-	else:
-		# Generate it
-		if dim in ("x", "xp", "xplane"):
-			openmc_surf = openmc.XPlane(counter.add_surface(), x0 = coeff, name = name)
-		elif dim in ("y", "yp", "yplane"):
-			openmc_surf = openmc.YPlane(counter.add_surface(), y0 = coeff, name = name)
-		elif dim in ("z", "zp", "zplane"):
-			openmc_surf = openmc.ZPlane(counter.add_surface(), z0 = coeff, name = name)
-		elif dim in ("r", "cyl", "cylinder", "zcylinder"):
-			openmc_surf = openmc.ZCylinder(counter.add_surface(), R = coeff, name = name)
-		else:
-			errstr = "'dim' must be 'xplane', 'yplane', 'zplane', or 'zcylinder'"
-			raise AssertionError(errstr)
-		surfdict[key] = openmc_surf
+	openmc_surf = surfdict.get(key)
+	if openmc_surf is not None:
 		return openmc_surf
+	
+	# Generate it
+	surface_type = _SURFACE_TYPES.get(dim.lower())
+	if surface_type is None:
+		errstr = "'dim' must be 'xplane', 'yplane', 'zplane', or 'zcylinder'"
+		raise AssertionError(errstr)
+	surface_class, coeff_name = surface_type
+	openmc_surf = surface_class(counter.add_surface(), name = name, **{coeff_name: coeff})
+	surfdict[key] = openmc_surf
+	return openmc_surf
 
 
@@ -37,6 +37,8 @@ class MeshGroup(object):
 					mesh increases by 1.
 					[Default: 1]
 	"""
+	__slots__ = ("_dx", "_dy", "_nx", "_ny", "_meshes", "_mesh_filters", "_tallies",
+	             "x0", "y0", "z0", "_z", "_id0", "_next_id", "_nzs", "_dzs")
 	
 	def __init__(self, pitch, nx, ny, lower_left=(0.0, 0.0, 0.0), id0=1):
 		if isinstance(pitch, (int, float)):
@@ -102,6 +104,10 @@ class MeshGroup(object):
 	
 	@nzs.setter
 	def nzs(self, nzs_in):
+		nzs_arr = np.asarray(nzs_in)
+		if np.any(nzs_arr != np.round(nzs_arr)):
+			raise ValueError("`nzs` must be integers; got {}".format(nzs_in))
+		nzs_in = nzs_arr.astype(int)
 		if self._dzs is not None:
 			if len(nzs_in) != len(self._dzs):
 				raise IndexError(_len_err_str)
@@ -109,7 +115,8 @@ class MeshGroup(object):
 	
 	@dzs.setter
 	def dzs(self, dzs_in):
-		if self._nzs.any():
+		dzs_in = np.asarray(dzs_in, dtype=float)
+		if self._nzs is not None:
 			if len(dzs_in) != len(self._nzs):
 				raise IndexError(_len_err_str)
 		self._dzs = dzs_in
@@ -120,8 +127,10 @@ class MeshGroup(object):
 		return nid
 	
 	def __assert_nzs_dzs(self):
-		assert self._nzs.any(), "Mesh_group.nzs has not been set. Cannot get profile."
-		assert self._dzs.any(), "Mesh_group.dzs has not been set. Cannot get profile."
+		assert self._nzs is not None and len(self._nzs) > 0, \
+			"Mesh_group.nzs has not been set. Cannot get profile."
+		assert self._dzs is not None and len(self._dzs) > 0, \
+			"Mesh_group.dzs has not been set. Cannot get profile."
 	
 	def add_mesh(self, z1=None, nz=None, dz=None):
 		"""Add a mesh to the group. You must supply two of the
@@ -192,8 +201,9 @@ class MeshGroup(object):
 		zlist:      array of z-values (height), in cm
 		"""
 		self.__assert_nzs_dzs()
-		zlist = np.zeros(sum(self.nzs))
-		xlist = np.zeros(sum(self.nzs))
+		ntotal = int(self._nzs.sum())
+		zlist = np.zeros(ntotal)
+		xlist = np.zeros(ntotal)
 		z = 0
 		k = 0
 		for i in range(self.n):
@@ -201,13 +211,12 @@ class MeshGroup(object):
 			dz = self._dzs[i]
 			talvalsi = state.get_tally(id=i + 1).get_values()
 			talvalsi.shape = (self._nx, self._ny, nz)
-			for j in range(nz):
-				z += dz
-				zlist[k] = z
-				xlist[k] = talvalsi[:, :, j].sum()/dz
-				k += 1
+			zlist[k:k + nz] = z + dz*np.arange(1, nz + 1)
+			xlist[k:k + nz] = talvalsi.sum(axis=(0, 1))/dz
+			z += nz*dz
+			k += nz
 		
-		xlist[xlist <= eps] = np.NaN
+		xlist[xlist <= eps] = np.nan
 		xlist /= np.nanmean(xlist)
 		return xlist, zlist
 	
@@ -238,7 +247,7 @@ class MeshGroup(object):
 			xyarray = np.zeros((self._ny, self._nx))
 			for i in range(nz):
 				xyarray += talvals[i, :, :]
-		xyarray[xyarray <= eps] = np.NaN
+		xyarray[xyarray <= eps] = np.nan
 		return xyarray
 	
 	def get_tally_id_by_index(self, index):
@@ -318,7 +327,7 @@ class MeshGroup(object):
 		if (zval is not None) and (index is None):
 			index = self.get_index_by_z(zval)
 		
-		max_i = sum(self._nzs)
+		max_i = int(self._nzs.sum())
 		errstr = "Index {} out of {} does not exist".format(index, max_i)
 		assert index <= max_i, errstr
 		
@@ -356,7 +365,7 @@ class MeshGroup(object):
 				xyarray = talvals[:, :, tally_index]
 		
 		# Replace things below the tolerance with NaNs before normalizing
-		xyarray[xyarray <= eps] = np.NaN
+		xyarray[xyarray <= eps] = np.nan
 		xyarray /= np.nanmean(xyarray)
 		return xyarray
 
@@ -1,5 +1,7 @@
 # Module for smeared materials (mixtures)
 
+import sys
+from collections import defaultdict
 from openmc import Material
 from openmc.data import atomic_mass
 
@@ -54,24 +56,20 @@ class Mixture(Material):
 	def __init__(self, materials, vfracs, material_id=None, frac_type='wo', name=""):
 		super(Mixture, self).__init__(material_id, name)
 		
-		mix_isos = []
+		weights = defaultdict(float)
 		density = 0.0
+		vtot = sum(vfracs)
 		
-		for i in range(len(materials)):
-			density += materials[i].density*(vfracs[i]/sum(vfracs))
-		for i in range(len(materials)):
-			mat = materials[i]
+		for mat, vf in zip(materials, vfracs):
 			# mat.convert_ao_to_wo() --> Exists in VERA-to-OpenMC, but not here
-			wtf = vfracs[i]*mat.density  # weight fraction of entire material
+			wtf = vf*mat.density  # weight fraction of entire material
+			density += wtf/vtot
 			for nuc in mat.nuclides:
-				nuclide = nuc[0]
-				new_wt = wtf*nuc[1]/density
-				if nuc in mix_isos:
-					old_wt = mix_isos[nuc][1]
-					mix_isos.append((nuclide, new_wt + old_wt, frac_type))
-				else:
-					mix_isos.append((nuclide, new_wt, frac_type))
+				# Interned, so the same nuclide from each material is one key object
+				weights[sys.intern(nuc[0])] += wtf*nuc[1]
 		
+		# Normalize the weights by the mixture density: only known after all materials
+		mix_isos = [(nuclide, wt/density, frac_type) for nuclide, wt in weights.items()]
 		self._nuclides = mix_isos
 		self.set_density("g/cc", density)
 	
@@ -3,10 +3,54 @@
 # Class and functions for PWR neutron pads
 
 import openmc
+import numpy
 import math
+import weakref
+from functools import lru_cache
+from pwr.functions import _njit, _have_numba
+
+_DEG2RAD = math.pi/180.0
+_PI_2 = math.pi/2.0
+# Number of evenly spaced pads between direct evaluations of sin and cos
+_RESEED = 8
+# Fewest pads for which compiling _pad_plane_coeffs_jit() pays for itself.
+# Loading it (even from Numba's cache) takes a few hundred ms, which the
+# NumPy version only loses back at several million pads.
+_JIT_MIN_NPADS = 6000000
+# Planes of the neutron pads generated so far with each Counter, of the format
+# {counter: {(npads, arc_length, angle): [openmc.Plane, ...]}}
+# Weakly keyed, so the planes are released along with their Counter.
+_PLANE_CACHE = weakref.WeakKeyDictionary()
 
 
 # Simple functions for the necessary angles/coefficients
+# (The underscored default arguments of phi_rad(), a() and b() bind globals as
+# fast locals; don't pass them. The cached phi() and ab() only run their bodies
+# on a cache miss, so they look up globals as usual.)
+def phi_rad(th, _deg2rad = _DEG2RAD, _pi_2 = _PI_2):
+	"""Angle (radians) on the XY plane at which the normal vector to a plane will be
+	
+	Inputs:
+		:param th:          float; angle (degrees) of the plane itself on the XY plane
+	Output:
+		:return angle:      float; angle in radians
+	"""
+	return th*_deg2rad - _pi_2
+
+
+def phi_deg(th):
+	"""Angle (degrees) on the XY plane at which the normal vector to a plane will be
+	
+	Inputs:
+		:param th:          float; angle (degrees) of the plane itself on the XY plane
+	Output:
+		:return angle:      float; angle in degrees
+	"""
+	return th - 90.0
+
+
+# (cached: every pad boundary is evaluated at the same few angles)
+@lru_cache(maxsize = 256)
 def phi(th, radians = True):
 	"""Angle on the XY plane at which the normal vector to a plane will be
 	
@@ -18,14 +62,26 @@ def phi(th, radians = True):
 	Output:
 		:return angle:      float; angle (in radians, or degrees if radians == False)
 	"""
-	angle = th * math.pi/180 - math.pi/2
 	if radians:
-		return angle
+		return phi_rad(th)
 	else:
-		return angle * 180 / math.pi
+		return phi_deg(th)
+
+
+@lru_cache(maxsize = 256)
+def ab(th):
+	"""Coefficients 'A' and 'B' for a plane equation, found together
+	
+		Inputs:
+			:param th:          float; angle (degrees) of the plane itself on the XY plane
+		Output:
+			:return A, B:       tuple of floats; (sin(phi(th)), cos(phi(th)))
+		"""
+	angle = phi_rad(th)
+	return math.sin(angle), math.cos(angle)
 
 
-def a(th):
+def a(th, _ab = ab):
 	"""Coefficient 'A' for a plane equation
 
 		Inputs:
@@ -33,10 +89,10 @@ def a(th):
 		Output:
 			:return A:          float
 		"""
-	return math.sin(phi(th))
+	return _ab(th)[0]
 	
 	
-def b(th):
+def b(th, _ab = ab):
 	"""Coefficient 'B' for a plane equation
 
 		Inputs:
@@ -44,8 +100,75 @@ def b(th):
 		Output:
 			:return B:          float
 		"""
-	B = math.cos(phi(th))
-	return B
+	return _ab(th)[1]
+
+
+@_njit(cache = True)
+def _pad_plane_coeffs_jit(angle, arc_length, npads):
+	"""Coefficients 'A' and 'B' of the planes bounding every neutron pad
+	
+	The pads are evenly spaced by a step of 360/npads degrees. The sine and cosine
+	of each multiple of the step are tabulated by the Chebyshev recurrences
+		sin((k+1)*step) = 2*cos(step)*sin(k*step) - sin((k-1)*step)
+		cos((k+1)*step) = 2*cos(step)*cos(k*step) - cos((k-1)*step)
+	and the angle-addition formulas offset them to the first pad's planes.
+	They are recomputed directly every _RESEED pads, so the rounding error
+	does not build up.
+	
+		Inputs:
+			:param angle:       float (degrees); angle at the center of the first pad
+			:param arc_length:  float (degrees); arc length of a single neutron pad
+			:param npads:       int; number of evenly placed pads
+		Output:
+			:return coeffs:     array of shape (2*npads, 2) of the coefficients (A, B)
+			                    of the planes in order around the circle: the start
+			                    (2*k) and end (2*k + 1) of the k^th pad
+		"""
+	step = 360.0 / npads * _DEG2RAD
+	phi0 = (angle - arc_length / 2.0) * _DEG2RAD - _PI_2
+	phi1 = phi0 + arc_length * _DEG2RAD
+	s0, c0 = math.sin(phi0), math.cos(phi0)
+	s1, c1 = math.sin(phi1), math.cos(phi1)
+	two_cos_step = 2.0 * math.cos(step)
+	# sin and cos of k*step, and of (k - 1)*step
+	sk, ck = 0.0, 1.0
+	sk_prev, ck_prev = -math.sin(step), math.cos(step)
+	coeffs = numpy.empty((2 * npads, 2))
+	for k in range(npads):
+		if k > 0 and k % _RESEED == 0:
+			sk, ck = math.sin(k*step), math.cos(k*step)
+			sk_prev, ck_prev = math.sin((k - 1)*step), math.cos((k - 1)*step)
+		coeffs[2*k, 0] = sk*c0 + ck*s0
+		coeffs[2*k, 1] = ck*c0 - sk*s0
+		coeffs[2*k + 1, 0] = sk*c1 + ck*s1
+		coeffs[2*k + 1, 1] = ck*c1 - sk*s1
+		# Advance to the next multiple of the step
+		sk, sk_prev = two_cos_step*sk - sk_prev, sk
+		ck, ck_prev = two_cos_step*ck - ck_prev, ck
+	return coeffs
+
+
+def _pad_plane_coeffs_numpy(angle, arc_length, npads):
+	"""Coefficients 'A' and 'B' of the planes bounding every neutron pad
+	
+	Same as _pad_plane_coeffs_jit(), but evaluates every angle at once by
+	broadcasting the pad starts against (0, arc_length), which is faster
+	than the scalar loop when it is not compiled.
+	"""
+	starts = angle - arc_length / 2.0 + (360.0 / npads) * numpy.arange(npads)
+	phis = (starts[:, None] + numpy.array([0.0, arc_length])).ravel() * _DEG2RAD - _PI_2
+	coeffs = numpy.empty((2 * npads, 2))
+	coeffs[:, 0] = numpy.sin(phis)
+	coeffs[:, 1] = numpy.cos(phis)
+	return coeffs
+
+
+def _pad_plane_coeffs(angle, arc_length, npads):
+	"""Use NumPy's vectorized trig, unless there are enough pads for
+	compiling the recurrence with Numba to be worth it"""
+	if npads >= _JIT_MIN_NPADS and _have_numba():
+		return _pad_plane_coeffs_jit(angle, arc_length, npads)
+	return _pad_plane_coeffs_numpy(angle, arc_length, npads)
 
 
 class Neutron_Pads(object):
@@ -79,9 +202,18 @@ class Neutron_Pads(object):
 		                    [Empty until Neutron_Pads.get_cells() is executed.]
         :param generated:   Boolean; whether or not get_cells() has been executed yet.
 	"""
+	__slots__ = ("region", "material", "mod", "npads", "arc_length", "angle", "counter",
+	             "cells", "planes", "generated", "_has_gap",
+	             "_plane_coeffs")
+	# Plane coefficients of the symmetric layouts made so far by from_symmetric(),
+	# of the format {(npads, arc_length): array of shape (2*npads, 2)}
+	_SYMMETRIC_TABLE = {}
+	
 	def __init__(self, region, pad_mat, mod_mat,
                 npads = 4, arc_length = 32, angle = 45, counter = None):
-		assert arc_length * npads <= 360, "The combined arclength must be less than 360 degrees."
+		total_arc = arc_length * npads
+		if total_arc > 360:
+			raise ValueError("The combined arclength must be less than 360 degrees.")
 		self.region = region
 		self.material = pad_mat
 		self.mod = mod_mat
@@ -89,21 +221,60 @@ class Neutron_Pads(object):
 		self.arc_length = arc_length
 		self.angle = angle
 		self.counter = counter
+		# Without a gap, each pad ends at the next one's start, and there is no moderator between
+		self._has_gap = total_arc < 360.0 - 1e-9
+		# Precomputed plane coefficients, if known (see from_symmetric())
+		self._plane_coeffs = None
 		
 		self.cells = []
 		self.planes = []
 		self.generated = False
 	
+	@classmethod
+	def from_symmetric(cls, region, pad_mat, mod_mat, npads = 4, arc_length = 32, counter = None):
+		"""Neutron pads in the usual symmetric layout, with the first pad centered at
+		45 degrees. The plane coefficients of each layout are only computed once, and
+		are shared by every set of neutron pads made this way (e.g., when only the
+		materials change).
+		
+		Inputs are the same as for Neutron_Pads(), without 'angle'.
+		"""
+		key = (npads, arc_length)
+		coeffs = cls._SYMMETRIC_TABLE.get(key)
+		if coeffs is None:
+			coeffs = _pad_plane_coeffs(45, arc_length, npads)
+			cls._SYMMETRIC_TABLE[key] = coeffs
+		pads = cls(region, pad_mat, mod_mat, npads, arc_length, 45, counter)
+		pads._plane_coeffs = coeffs
+		return pads
+	
 	def __str__(self):
-		rep = "Neutron pads:"
-		rep += "\n\t" + str(self.npads) + " pads"
-		rep += "\n\tArc length: " + str(self.arc_length) + " degrees"
-		rep += "\n\tStarting angle: " + str(self.angle) + " degrees"
 		if self.generated:
-			rep += "\n\tThese neutron pads have been generated."
+			status = "These neutron pads have been generated."
 		else:
-			rep += "\n\tThe neutron pads have NOT been generated."
-		return rep
+			status = "The neutron pads have NOT been generated."
+		return "\n\t".join(("Neutron pads:",
+		                    str(self.npads) + " pads",
+		                    "Arc length: " + str(self.arc_length) + " degrees",
+		                    "Starting angle: " + str(self.angle) + " degrees",
+		                    status))
+	
+	def _make_planes(self, sins, coss):
+		"""Create the planes with the given coefficients 'A' and 'B'.
+		Their surface ids are reserved from the counter all at once.
+		
+		Inputs:
+			:param sins:      list of floats; coefficient 'A' of each plane
+			:param coss:      list of floats; coefficient 'B' of each plane
+		Output:
+			:return planes:   list of instances of openmc.Plane
+		"""
+		Plane = openmc.Plane
+		if self.counter:
+			ids = self.counter.add_surfaces(len(sins))
+			return [Plane(sid, A = A, B = B) for sid, A, B in zip(ids, sins, coss)]
+		else:
+			return [Plane(A = A, B = B) for A, B in zip(sins, coss)]
 	
 	def get_cells(self):
 		"""Get the cells and planes necessary for modeling these neutron pads in openmc.
@@ -113,46 +284,58 @@ class Neutron_Pads(object):
 			:return cells:    list of the instances of openmc.Cell making up the pads
 		"""
 		if not self.generated:
-			theta = 360 / self.npads
-			p2 = None   # Placeholder for the last surface used
+			# Neutron pads with the same geometry and Counter share their planes.
+			# (Without a Counter, there is nothing to scope the cache to.)
+			if self.counter:
+				cache = _PLANE_CACHE.setdefault(self.counter, {})
+			else:
+				cache = {}
+			key = (self.npads, self.arc_length, self.angle)
+			planes = cache.get(key)
+			if planes is None:
+				# Planes in order around the circle: the start (2*i) and end (2*i + 1) of the i^th pad
+				coeffs = self._plane_coeffs
+				if coeffs is None:
+					coeffs = _pad_plane_coeffs(self.angle, self.arc_length, self.npads)
+				if not self._has_gap:
+					# Only the start of each pad: its end is the start of the next
+					coeffs = coeffs[0::2]
+				planes = self._make_planes(coeffs[:, 0].tolist(), coeffs[:, 1].tolist())
+				cache[key] = planes
+			self.planes.extend(planes)
+			
+			# Each plane bounds two cells: make its two halfspaces once
+			positive = [+p for p in self.planes]
+			negative = [-p for p in self.planes]
+			nplanes = len(self.planes)
+			if self._has_gap:
+				stride = 2
+			else:
+				stride = 1
 			for i in range(self.npads):
 				name = "Neutron pad " + str(i + 1)
-				th0 = self.angle + i * theta - self.arc_length / 2.0
-				th1 = th0 + self.arc_length
-				# Define the surfaces bounding the i^th pad
-				if self.counter:
-					if p2:
-						p0 = p2
-					else:
-						p0 = openmc.Plane(self.counter.add_surface(), A = a(th0), B = b(th0))
-						self.planes.append(p0)
-					p1 = openmc.Plane(self.counter.add_surface(), A = a(th1), B = b(th1))
-				else:
-					if p2:
-						p0 = p2
-					else:
-						p0 = openmc.Plane(A = a(th0), B = b(th0))
-						self.planes.append(p0)
-					p1 = openmc.Plane(A = a(th1), B = b(th1))
-				self.planes.append(p1)
+				# Surfaces bounding the i^th pad, and the start of the next one
+				# (the last cell is closed by the first plane).
+				i0 = stride * i
+				i1 = (i0 + 1) % nplanes
+				i2 = (i0 + 2) % nplanes
 				
 				# Create the cell for the i^th pad itself
 				if self.counter:
 					new_pad = openmc.Cell(self.counter.add_cell(), name)
 				else:
 					new_pad = openmc.Cell(name = name)
-				new_pad.region = self.region & +p1 & -p0
+				new_pad.region = openmc.Intersection([self.region, positive[i1], negative[i0]])
 				new_pad.fill = self.material
 				self.cells.append(new_pad)
+				if not self._has_gap:
+					continue
 				# Create the cell between this and the next pad
-				th2 = th0 + theta
 				if self.counter:
-					p2 = openmc.Plane(self.counter.add_surface(), A = a(th2), B = b(th2))
 					new_space = openmc.Cell(self.counter.add_cell())
 				else:
-					p2 = openmc.Plane(A = a(th2), B = b(th2))
 					new_space = openmc.Cell()
-				new_space.region = self.region & +p2 & -p1
+				new_space.region = openmc.Intersection([self.region, positive[i2], negative[i1]])
 				new_space.fill = self.mod
 				self.cells.append(new_space)
 			# And we're done
@@ -9,6 +9,15 @@ import numpy
 from math import sqrt
 
 
+def _calc_thickness(mass, density, height, pitch, npins):
+	"""Spacer thickness (cm) around each pincell; see SpacerGrid.calculate_thickness()"""
+	A = mass / density / height
+	discriminant = pitch*pitch - A/(npins*npins)
+	if discriminant < 0:
+		raise ValueError("The spacer grid is too massive to fit around the pincells at this pitch.")
+	return 0.5*(pitch - sqrt(discriminant))
+
+
 class SpacerGrid(object):
 	"""Object to hold properties of an assembly's spacer grids
 	
@@ -59,8 +68,7 @@ class SpacerGrid(object):
 				          [             (          npins^2   ) ]
         '''
 		
-		A = self.mass / self.material.density / self.height
-		t = 0.5*(pitch - sqrt(pitch**2 - A/npins**2))
+		t = _calc_thickness(self.mass, self.material.density, self.height, pitch, npins)
 		return t
 		
 	def __str__(self):
@@ -68,7 +76,55 @@ class SpacerGrid(object):
 		return name
 
 
-def add_spacer_to(pincell, pitch, t, material, counter, xplanes, yplanes):
+def _make_spacer_planes(pitch, t, counter, xplanes, yplanes):
+	"""Get the 8 planes bounding the spacer around a single pincell.
+	
+	Inputs:
+		pitch:		float; pin pitch in cm
+		t:			float; thickness in cm of one edge of the spacer
+		counter:	instance of Counter
+		xplanes:	dictionary of instances of openmc.XPlane, of the format {str(x0):xplane}
+		yplanes:	dictionary of instances of openmc.YPlane, of the format {str(y0):yplane}
+	
+	Output:
+		planes:		tuple of (top_out, top_in, bot_in, bot_out,
+							  left_out, left_in, right_in, right_out)
+	"""
+	p = pitch / 2.0
+	top_out   = get_surface(counter, yplanes, 'y', p)
+	top_in    = get_surface(counter, yplanes, 'y',  p - t)
+	bot_in    = get_surface(counter, yplanes, 'y', -p + t)
+	bot_out   = get_surface(counter, yplanes, 'y', -p)
+	left_out  = get_surface(counter, xplanes, 'x', -p)		# He feels left out
+	left_in   = get_surface(counter, xplanes, 'x', -p + t)
+	right_in  = get_surface(counter, xplanes, 'x',  p - t)
+	right_out = get_surface(counter, xplanes, 'x',  p)
+	return top_out, top_in, bot_in, bot_out, left_out, left_in, right_in, right_out
+
+
+def _make_spacer_regions(planes):
+	"""Get the regions needed to add a spacer to a pincell. They depend only
+	on the spacer planes, so they may be shared by every pincell in a lattice.
+	
+	Input:
+		planes:			tuple of the 8 spacer planes, as returned by _make_spacer_planes()
+	
+	Output:
+		spacer_region:	instance of openmc.Union; the 4 sides of the spacer
+		mod_bounds:		list of the 4 instances of openmc.Halfspace bounding the
+						moderator inside the spacer
+	"""
+	top_out, top_in, bot_in, bot_out, left_out, left_in, right_in, right_out = planes
+	spacer_region = openmc.Union([
+		openmc.Intersection([+left_out,	+top_in,	-top_out,	-right_out]),
+		openmc.Intersection([+right_in,	-right_out,	+bot_in,	-top_in]),
+		openmc.Intersection([+left_out,	-left_in,	+bot_in,	-top_in]),
+		openmc.Intersection([+bot_out,	-bot_in,	+left_out,	-right_out])])
+	mod_bounds = [+bot_in, +left_in, -top_in, -right_in]
+	return spacer_region, mod_bounds
+
+
+def add_spacer_to(pincell, pitch, t, material, counter, xplanes = None, yplanes = None, regions = None):
 	"""Given a pincell to be placed in a lattice, add
 	the spacer grid to the individual cell.
 	
@@ -81,13 +137,16 @@ def add_spacer_to(pincell, pitch, t, material, counter, xplanes, yplanes):
 		material:	instance of openmc.Material from which the spacer is made
 		counter:	instance of Counter to keep track of universe numbers
 		xplanes:	dictionary of existing instances of openmc.XPlane, of the format
-					{str(x0):xplane}    [Default: empty dictionary]
+					{str(x0):xplane}    [Default: None, a new empty dictionary]
 					This is optional, but strongly recommended if you are adding
 					spacers to more than one pin cell.
 		yplanes:    dictionary of existing instances of openmc.YPlane, of the format
-					{str(y0):yplane}    [Default: empty dictionary]
+					{str(y0):yplane}    [Default: None, a new empty dictionary]
 					This is optional, but strongly recommended if you are adding
 					spacers to more than one pin cell.
+		regions:	tuple of (spacer_region, mod_bounds), as returned by _make_spacer_regions().
+					If supplied, 'xplanes' and 'yplanes' are not searched.
+					[Default: None]
 	
 	Output:
 		new_pin:	instance of openmc.Universe describing the pincell
@@ -99,16 +158,14 @@ def add_spacer_to(pincell, pitch, t, material, counter, xplanes, yplanes):
 	orig_list = list(pincell.cells.values())
 	suffix = " (gridded)"
 	
-	# Create necessary planes
-	p = pitch / 2.0
-	top_out   = get_surface(counter, yplanes, 'y', p)
-	top_in    = get_surface(counter, yplanes, 'y',  p - t)
-	bot_in    = get_surface(counter, yplanes, 'y', -p + t)
-	bot_out   = get_surface(counter, yplanes, 'y', -p)
-	left_out  = get_surface(counter, xplanes, 'x', -p)		# He feels left out
-	left_in   = get_surface(counter, xplanes, 'x', -p + t)
-	right_in  = get_surface(counter, xplanes, 'x',  p - t)
-	right_out = get_surface(counter, xplanes, 'x',  p)
+	# Create necessary planes and regions
+	if regions is None:
+		if xplanes is None:
+			xplanes = {}
+		if yplanes is None:
+			yplanes = {}
+		regions = _make_spacer_regions(_make_spacer_planes(pitch, t, counter, xplanes, yplanes))
+	spacer_region, mod_bounds = regions
 	
 	# Get the outermost (mod) Cell of the pincell
 	mod_cell = duplicate(orig_list[-1], counter)
@@ -116,27 +173,27 @@ def add_spacer_to(pincell, pitch, t, material, counter, xplanes, yplanes):
 	
 	# Make a cell encompassing the 4 sides of the spacer
 	spacer = openmc.Cell(counter.add_cell(), name = pincell.name + " spacer")
-	spacer.region = (+left_out	& +top_in 	& -top_out	&	-right_out) | \
-					(+right_in	& -right_out& +bot_in	& 	-top_in)	| \
-					(+left_out	& -left_in	& +bot_in	&	-top_in)	| \
-					(+bot_out 	& -bot_in	& +left_out	&	-right_out )
+	spacer.region = spacer_region
 	spacer.fill = material
-	# Then fix the moderator cell to be within the bounds of the spacer
-	mod_cell.region &= (+bot_in	& +left_in	& -top_in	& -right_in )
+	# Then fix the moderator cell to be within the bounds of the spacer.
+	# (Build a new Intersection: the old region is shared with the original pincell.)
+	mod_cell.region = openmc.Intersection([mod_cell.region] + mod_bounds)
 	
 	new_pin = openmc.Universe(counter.add_universe(), name = pincell.name + " gridded")
 	# Add all of the original cells except the old mod cell
-	for i in range(len(orig_list) - 1):
-		new_cell = duplicate(orig_list[i], counter)
+	new_cells = []
+	for orig_cell in orig_list[:-1]:
+		new_cell = duplicate(orig_cell, counter)
 		new_cell.name += suffix
-		new_pin.add_cell(new_cell)
-	new_pin.add_cell(mod_cell) 	# the new mod cell
-	new_pin.add_cell(spacer)
+		new_cells.append(new_cell)
+	new_cells.append(mod_cell) 	# the new mod cell
+	new_cells.append(spacer)
+	new_pin.add_cells(new_cells)
 	
 	return new_pin
 
 
-def add_grid_to(lattice, spacer, counter, xplanes = {}, yplanes = {}):
+def add_grid_to(lattice, spacer, counter, xplanes = None, yplanes = None):
 	"""Add a spacer to every pincell in the lattice.
 
 	Inputs:
@@ -145,8 +202,10 @@ def add_grid_to(lattice, spacer, counter, xplanes = {}, yplanes = {}):
 		counter:		instance of Counter
 		xplanes:        dictionary of instances of openmc.XPlane, of the format
 						{str(x0):xplane}. Optional, but strongly recommended.
+						[Default: None, a new empty dictionary]
 		yplanes:        dictionary of instances of openmc.YPlane, of the format
 						{str(y0):yplane}. Optional, but strongly recommended.
+						[Default: None, a new empty dictionary]
 	Output:
 		gridded:		instance of openmc.RectLattice with the grid applied
 						to every cell"""
@@ -155,21 +214,32 @@ def add_grid_to(lattice, spacer, counter, xplanes = {}, yplanes = {}):
 	assert lattice.pitch[0] == lattice.pitch[1], "lattice must have a square pitch at this time.\n" + \
 			"If you need a non-square rectangular pitch, please contact the developers."
 	assert isinstance(spacer, SpacerGrid), "'spacer' must be an instance of SpacerGrid."
+	if xplanes is None:
+		xplanes = {}
+	if yplanes is None:
+		yplanes = {}
 	pitch = lattice.pitch[0]
 	n = len(lattice.universes)
 	new_universes = numpy.empty((n,n), dtype = openmc.Universe)
+	gkey = spacer.key
+	# The spacer planes and regions are the same for every pincell in the lattice.
+	# They are only needed if some pincell has not been gridded by this spacer yet.
+	regions = None
 	
 	for j in range(n):
+		lat_row = lattice.universes[j]
 		for i in range(n):
-			old_cell = lattice.universes[j][i]
-			gkey = spacer.key
-			if gkey in old_cell.griddict:
-				new_cell = old_cell.griddict[gkey]
-			else:
+			old_cell = lat_row[i]
+			griddict = old_cell.griddict
+			new_cell = griddict.get(gkey)
+			if new_cell is None:
+				if regions is None:
+					planes = _make_spacer_planes(pitch, spacer.thickness, counter, xplanes, yplanes)
+					regions = _make_spacer_regions(planes)
 				new_cell = add_spacer_to(old_cell, pitch, spacer.thickness, spacer.material,
-										  counter, xplanes, yplanes)
-				old_cell.griddict[gkey] = new_cell
-			new_universes[j][i] = new_cell
+										  counter, xplanes, yplanes, regions)
+				griddict[gkey] = new_cell
+			new_universes[j, i] = new_cell
 	
 	if lattice.name:
 		new_name = lattice.name + "-grid:" + spacer.key